@@ -0,0 +1,107 @@
+import threading
+import time
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when a reservation cannot be admitted
+    """
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """
+    Units held against a ResourceBudget; release() is safe to call twice
+    """
+
+    def __init__(self, budget, amount):
+        self.budget = budget
+        self.amount = amount
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.budget._release(self.amount)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class ResourceBudget:
+    """
+    Counting semaphore over an arbitrary unit (slots, bytes).
+
+    Requests wait up to `timeout` seconds for capacity. At most `max_waiting`
+    requests may queue; beyond that they are turned away immediately with
+    429, while requests that time out in the queue get 503.
+    """
+
+    def __init__(self, name, capacity, max_waiting, timeout, retry_after):
+        self.name = name
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._condition = threading.Condition()
+        self._in_use = 0
+        self._peak = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def reserve(self, amount=1):
+        if amount > self.capacity:
+            raise ValueError(f"Request needs {amount} of {self.name}, more than the total capacity {self.capacity}")
+
+        with self._condition:
+            if self._in_use + amount > self.capacity:
+                if self._waiting >= self.max_waiting:
+                    self._rejected += 1
+                    raise BudgetExceeded(f"Server busy: {self.name} queue is full", 429, self.retry_after)
+                self._waiting += 1
+                deadline = time.monotonic() + self.timeout
+                try:
+                    while self._in_use + amount > self.capacity:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timed_out += 1
+                            raise BudgetExceeded(f"Server busy: no {self.name} available", 503, self.retry_after)
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._in_use += amount
+            self._peak = max(self._peak, self._in_use)
+            self._admitted += 1
+        return Reservation(self, amount)
+
+    def _release(self, amount):
+        with self._condition:
+            self._in_use -= amount
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "capacity": self.capacity,
+                "in_use": self._in_use,
+                "available": self.capacity - self._in_use,
+                "utilization": self._in_use / self.capacity if self.capacity else 0.0,
+                "peak": self._peak,
+                "waiting": self._waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out
+            }
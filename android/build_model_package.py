@@ -0,0 +1,306 @@
+"""
+Build on-device model packages from the trained Keras model.
+
+Each variant combines optional one-shot magnitude pruning with a
+quantization mode, embeds the class labels and preprocessing parameters in
+the .tflite file, and is measured for size, host-CPU interpreter latency
+and accuracy against the Keras model on held-out Dataset/ images.
+
+Variants and report.json are written to android/build/model_package; only
+--install copies the recommended variant to the app's assets/model.tflite.
+
+    python android/build_model_package.py Saved_Models/plant_disease_model.h5 --install
+    python android/build_model_package.py model.h5 --quantize float16 int8 --sparsity 0 0.5
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import time
+import zipfile
+import zlib
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from tensorflow.lite.python import schema_py_generated as schema_fb
+from tensorflow.lite.tools import flatbuffer_utils
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(ROOT, 'Dataset')
+OUTPUT_DIR = os.path.join(ROOT, 'android', 'build', 'model_package')
+# The model MainActivity loads from the APK's assets
+ASSET_MODEL_PATH = os.path.join(ROOT, 'android', 'app', 'src', 'main', 'assets', 'model.tflite')
+
+# Must match training (train.ipynb): RGB, 224x224, pixels scaled to [0, 1]
+IMG_WIDTH = 224
+IMG_HEIGHT = 224
+CHANNELS = 3
+PIXEL_SCALE = 1 / 255.0
+# ImageDataGenerator(validation_split=0.2) in train.ipynb, and the files it lists
+VALIDATION_SPLIT = 0.2
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.tif', '.tiff')
+
+QUANTIZATION_MODES = ('float32', 'float16', 'dynamic', 'int8')
+METADATA_NAME = 'plant_disease_package'
+
+
+def dataset_labels():
+    """
+    Class labels in model output order: training used the sorted Dataset/ directories
+    """
+    return sorted(name for name in os.listdir(DATASET_DIR) if os.path.isdir(os.path.join(DATASET_DIR, name)))
+
+
+def split_dataset(labels, calibration_size, eval_per_class, seed=0):
+    """
+    Calibration and evaluation samples that follow the training split.
+
+    Keras' validation_split holds out the first 20% of each class's sorted
+    image files, so evaluation draws only from those and calibration only
+    from the training files.
+    """
+    rng = random.Random(seed)
+    calibration, evaluation = [], []
+    per_class = max(1, calibration_size // len(labels))
+    for index, label in enumerate(labels):
+        class_dir = os.path.join(DATASET_DIR, label)
+        files = [os.path.join(class_dir, f) for f in sorted(os.listdir(class_dir))
+                 if f.lower().endswith(IMAGE_EXTENSIONS)]
+        held_out = int(VALIDATION_SPLIT * len(files))
+        validation, training = files[:held_out], files[held_out:]
+        evaluation.extend((path, index) for path in rng.sample(validation, min(eval_per_class, len(validation))))
+        calibration.extend(rng.sample(training, min(per_class, len(training))))
+    rng.shuffle(calibration)
+    return calibration[:calibration_size], evaluation
+
+
+def load_image(path):
+    # Keras' load_img (used in training) resizes with nearest-neighbour by default
+    with Image.open(path) as img:
+        img = img.convert('RGB').resize((IMG_WIDTH, IMG_HEIGHT), Image.NEAREST)
+    return np.asarray(img, dtype=np.float32) * PIXEL_SCALE
+
+
+def prune_model(model, sparsity):
+    """
+    One-shot magnitude pruning: zero the smallest weights of every kernel.
+
+    No fine-tuning is done, so the accuracy report shows the true cost.
+    """
+    pruned = tf.keras.models.clone_model(model)
+    pruned.set_weights(model.get_weights())
+    for layer in pruned.layers:
+        kernel = getattr(layer, 'kernel', None)
+        if kernel is None:
+            continue
+        weights = kernel.numpy()
+        threshold = np.quantile(np.abs(weights), sparsity)
+        weights[np.abs(weights) < threshold] = 0
+        kernel.assign(weights)
+    return pruned
+
+
+def convert(model, mode, calibration_paths):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if mode == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'dynamic':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif mode == 'int8':
+        def representative_dataset():
+            for path in calibration_paths:
+                yield [load_image(path)[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Inputs and outputs stay float32 so the app's preprocessing is unchanged
+    return converter.convert()
+
+
+def package_metadata(labels, variant):
+    return {
+        'labels': labels,
+        'preprocessing': {
+            'input_size': [IMG_HEIGHT, IMG_WIDTH, CHANNELS],
+            'color_space': 'RGB',
+            'input_type': 'float32',
+            'scale': PIXEL_SCALE,
+            'offset': 0.0,
+            'resize': 'nearest'
+        },
+        'quantization': variant['quantize'],
+        'sparsity': variant['sparsity']
+    }
+
+
+def embed_metadata(tflite_model, metadata):
+    """
+    Store the package metadata inside the model.
+
+    The JSON goes into the flatbuffer's metadata table, and labels.txt plus
+    package.json are appended as a zip of associated files, the same layout
+    the TFLite Support library's MetadataExtractor reads.
+    """
+    payload = json.dumps(metadata, indent=2).encode()
+    model = flatbuffer_utils.convert_bytearray_to_object(bytearray(tflite_model))
+    buffer = schema_fb.BufferT()
+    buffer.data = np.frombuffer(payload, dtype=np.uint8)
+    model.buffers.append(buffer)
+    entry = schema_fb.MetadataT()
+    entry.name = METADATA_NAME
+    entry.buffer = len(model.buffers) - 1
+    model.metadata = (model.metadata or []) + [entry]
+
+    output = io.BytesIO(bytes(flatbuffer_utils.convert_object_to_bytearray(model)))
+    output.seek(0, io.SEEK_END)
+    with zipfile.ZipFile(output, 'a') as associated:
+        associated.writestr('labels.txt', '\n'.join(metadata['labels']) + '\n')
+        associated.writestr('package.json', payload)
+    return output.getvalue()
+
+
+def evaluate_keras(model, images, batch_size=32):
+    predictions = [model.predict(images[i:i + batch_size], verbose=0) for i in range(0, len(images), batch_size)]
+    return np.argmax(np.concatenate(predictions), axis=1)
+
+
+def evaluate_tflite(tflite_model, images, threads, latency_runs):
+    """
+    Top-1 predictions and single-image latency with the host CPU interpreter
+    """
+    interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=threads)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+
+    predicted = []
+    for image in images:
+        interpreter.set_tensor(input_index, image[np.newaxis])
+        interpreter.invoke()
+        predicted.append(int(np.argmax(interpreter.get_tensor(output_index)[0])))
+
+    timings = []
+    for i in range(latency_runs):
+        interpreter.set_tensor(input_index, images[i % len(images)][np.newaxis])
+        start = time.perf_counter()
+        interpreter.invoke()
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(predicted), {
+        'mean_ms': float(np.mean(timings)),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95))
+    }
+
+
+def build(args):
+    labels = args.labels or dataset_labels()
+    model = tf.keras.models.load_model(args.model)
+    num_outputs = model.output_shape[-1]
+    if num_outputs != len(labels):
+        raise SystemExit(f"Model has {num_outputs} outputs but {len(labels)} labels were given")
+
+    calibration_paths, evaluation = split_dataset(labels, args.calibration, args.eval_per_class, args.seed)
+    eval_images = np.stack([load_image(path) for path, _ in evaluation])
+    eval_labels = np.array([label for _, label in evaluation])
+
+    keras_predictions = evaluate_keras(model, eval_images)
+    baseline_accuracy = float(np.mean(keras_predictions == eval_labels))
+    print(f"Keras baseline accuracy: {baseline_accuracy:.2%} on {len(evaluation)} images")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report = {
+        'model': os.path.basename(args.model),
+        'baseline_accuracy': baseline_accuracy,
+        'eval_images': len(evaluation),
+        'calibration_images': len(calibration_paths),
+        'threads': args.threads,
+        'variants': []
+    }
+
+    for sparsity in args.sparsity:
+        source = prune_model(model, sparsity) if sparsity > 0 else model
+        for mode in args.quantize:
+            variant = {'quantize': mode, 'sparsity': sparsity}
+            name = f"plant_disease_{mode}" + (f"_sparse{int(sparsity * 100)}" if sparsity > 0 else '')
+            print(f"Building {name}...")
+            tflite_model = embed_metadata(convert(source, mode, calibration_paths),
+                                          package_metadata(labels, variant))
+            path = os.path.join(args.output_dir, name + '.tflite')
+            with open(path, 'wb') as f:
+                f.write(tflite_model)
+
+            predictions, latency = evaluate_tflite(tflite_model, eval_images, args.threads, args.latency_runs)
+            accuracy = float(np.mean(predictions == eval_labels))
+            variant.update({
+                'name': name,
+                'file': os.path.basename(path),
+                'size_bytes': len(tflite_model),
+                # Download size; pruned zeros only pay off once compressed
+                'compressed_bytes': len(zlib.compress(tflite_model, 9)),
+                'accuracy': accuracy,
+                'accuracy_delta': accuracy - baseline_accuracy,
+                'agreement_with_keras': float(np.mean(predictions == keras_predictions)),
+                'latency': latency
+            })
+            report['variants'].append(variant)
+
+    acceptable = [v for v in report['variants'] if -v['accuracy_delta'] <= args.max_accuracy_drop]
+    if acceptable:
+        report['recommended'] = min(acceptable, key=lambda v: (v['latency']['p50_ms'], v['size_bytes']))['name']
+
+    with open(os.path.join(args.output_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+
+    if args.install:
+        if 'recommended' not in report:
+            raise SystemExit('Nothing installed: no variant is within the accuracy budget')
+        os.makedirs(os.path.dirname(ASSET_MODEL_PATH), exist_ok=True)
+        shutil.copyfile(os.path.join(args.output_dir, report['recommended'] + '.tflite'), ASSET_MODEL_PATH)
+        print(f"Installed {report['recommended']} as {os.path.relpath(ASSET_MODEL_PATH, ROOT)}")
+
+
+def print_report(report):
+    print(f"\n{'variant':<32}{'size KB':>10}{'zip KB':>9}{'p50 ms':>9}{'p95 ms':>9}{'acc':>8}{'delta':>8}")
+    for v in report['variants']:
+        print(f"{v['name']:<32}{v['size_bytes'] / 1024:>10.0f}{v['compressed_bytes'] / 1024:>9.0f}"
+              f"{v['latency']['p50_ms']:>9.2f}{v['latency']['p95_ms']:>9.2f}"
+              f"{v['accuracy']:>8.1%}{v['accuracy_delta'] * 100:>+7.1f}%")
+    if 'recommended' in report:
+        print(f"\nRecommended: {report['recommended']} (fastest within the accuracy budget)")
+    else:
+        print("\nNo variant is within the accuracy budget")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', help='Trained Keras .h5 model')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Where to write .tflite files and report.json')
+    parser.add_argument('--install', action='store_true',
+                        help='Copy the recommended variant to the app assets as model.tflite')
+    parser.add_argument('--quantize', nargs='+', choices=QUANTIZATION_MODES, default=list(QUANTIZATION_MODES))
+    parser.add_argument('--sparsity', nargs='+', type=float, default=[0.0],
+                        help='Fractions of kernel weights to prune, e.g. 0 0.5 0.75')
+    parser.add_argument('--labels', nargs='+', help='Class labels in output order (default: Dataset/ directories)')
+    parser.add_argument('--calibration', type=int, default=200, help='Images for int8 calibration')
+    parser.add_argument('--eval-per-class', type=int, default=20, help='Validation-split images per class for accuracy')
+    parser.add_argument('--latency-runs', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=2, help='Interpreter threads (low-end phones: 1-2)')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help='Largest accuracy loss allowed for the recommended variant')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for sparsity in args.sparsity:
+        if not 0 <= sparsity < 1:
+            parser.error('--sparsity values must be in [0, 1)')
+    build(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 import os
+import json
+import math
 import tensorflow as tf
 import numpy as np
 from PIL import Image
 from treatment import analyzer
+from leaf_regions import find_leaf_regions, tile_boxes, crop_batch, MAX_REGIONS, TILES_PER_SIDE
+from frame_stream import (open_video, video_size, video_frames, image_frames, deduplicate, batched, VIDEO_EXTENSIONS,
+                          VIDEO_DECODING_AVAILABLE, DEFAULT_SAMPLE_FPS, DEFAULT_DEDUP_THRESHOLD,
+                          FRAME_BATCH_SIZE)
+from admission import ResourceBudget, BudgetExceeded
+from rate_limit import RateLimiter, MemoryBucketStore, SQLiteBucketStore
+from prediction_history import PredictionHistory, GRID_DEGREES
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import uuid
+import hashlib
 
 app = Flask(__name__)
 # Enable CORS for the React frontend
@@ -33,10 +44,83 @@ IMG_WIDTH = 224
 IMG_HEIGHT = 224
 CHANNELS = 3
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+MAX_STREAM_CONTENT_LENGTH = 256 * 1024 * 1024  # 256MB max video or frame sequence
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000  # larger images are refused before decoding
+
+# Cap enforced by Werkzeug while reading any request body
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+# Per-endpoint limits, checked against Content-Length before the body is read and
+# enforced by Werkzeug while reading chunked bodies that have no Content-Length.
+# Only these endpoints may exceed the global cap.
+UPLOAD_LIMITS = {
+    'predict_api': MAX_CONTENT_LENGTH,
+    'predict_stream_api': MAX_STREAM_CONTENT_LENGTH
+}
+
+# Admission control: bound concurrent decodes and in-flight inference memory
+MEMORY_BUDGET_BYTES = int(os.environ.get('MEMORY_BUDGET_MB', 1024)) * 1024 * 1024
+MAX_CONCURRENT_DECODES = int(os.environ.get('MAX_CONCURRENT_DECODES', os.cpu_count() or 2))
+MAX_QUEUED_REQUESTS = 32
+ADMISSION_TIMEOUT = 5  # seconds a request may wait for capacity
+RETRY_AFTER_SECONDS = 2
+
+decode_slots = ResourceBudget('decode slots', MAX_CONCURRENT_DECODES,
+                              MAX_QUEUED_REQUESTS, ADMISSION_TIMEOUT, RETRY_AFTER_SECONDS)
+memory_budget = ResourceBudget('inference memory', MEMORY_BUDGET_BYTES,
+                               MAX_QUEUED_REQUESTS, ADMISSION_TIMEOUT, RETRY_AFTER_SECONDS)
+
+# Region-based prediction for high-resolution field photos
+PREDICTION_MODES = ('single', 'regions', 'tiles')
+# Minimum confidence for a diseased region to drive the image verdict
+REGION_MIN_CONFIDENCE = 50.0
+
+# Rate limiting: per-client token buckets, prediction costs more than cheap lookups
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # 'memory' or 'sqlite'
+RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', 'rate_limits.db')
+RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', 5))  # tokens per second
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 60))
+# Comma-separated client addresses that are never limited, e.g. a load-test host
+RATE_LIMIT_EXEMPT = {addr.strip() for addr in os.environ.get('RATE_LIMIT_EXEMPT', '').split(',') if addr.strip()}
+ENDPOINT_COSTS = {
+    'predict_api': 10,
+    'predict_stream_api': 30
+}
+# Usage stats reported by /api/metrics
+RATE_LIMIT_STATS_TOP_CLIENTS = 50
+# Clients are reported by a salted hash so /api/metrics does not expose addresses
+CLIENT_HASH_SALT = os.urandom(16)
+
+if RATE_LIMIT_BACKEND == 'sqlite':
+    rate_limit_store = SQLiteBucketStore(RATE_LIMIT_DB)
+else:
+    rate_limit_store = MemoryBucketStore()
+rate_limiter = RateLimiter(rate_limit_store, RATE_LIMIT_RATE, RATE_LIMIT_BURST, ENDPOINT_COSTS)
+
+# Prediction history used for analysis history and outbreak tracking
+HISTORY_DB = os.environ.get('HISTORY_DB', 'prediction_history.db')
+OUTBREAK_DEFAULT_DAYS = 30
+HISTORY_MAX_LIMIT = 500
+
+history = PredictionHistory(HISTORY_DB)
 
 # Model configuration
 MODEL_PATH = os.path.join('Saved_Models', 'plant_disease_model.h5')
 
+def compute_model_version():
+    """
+    MODEL_VERSION from the environment, or a short hash of the model file
+    """
+    if os.environ.get('MODEL_VERSION'):
+        return os.environ['MODEL_VERSION']
+    if not os.path.exists(MODEL_PATH):
+        return None
+    digest = hashlib.sha256()
+    with open(MODEL_PATH, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
 # Load the model at startup
 def load_model_safe():
     global model
@@ -61,6 +145,7 @@ def load_model_safe():
 # Initialize model
 model = None
 model_loaded = load_model_safe()
+model_version = compute_model_version() if model_loaded else None
 
 # Define class names
 class_names = [
@@ -82,6 +167,8 @@ class_names = [
 
 # Weather API key (replace with your OpenWeatherMap API key)
 WEATHER_API_KEY = 'your_openweather_api_key'
+# Base URL of the weather provider, overridable to point at a local stub
+WEATHER_API_BASE_URL = os.environ.get('WEATHER_API_BASE_URL', 'http://api.openweathermap.org')
 
 # Soil quality thresholds
 SOIL_PH_RANGES = {
@@ -117,6 +204,29 @@ posts_db = []
 experts_db = []
 consultations_db = []
 
+def describe_prediction(probabilities):
+    """
+    Turn one row of model output into plant, disease and confidence fields
+    """
+    predicted_class = class_names[np.argmax(probabilities)]
+    confidence = float(100 * np.max(probabilities))
+
+    # Extract plant name from prediction
+    plant_name = predicted_class.split('_')[0]  # e.g., "Tomato" from "Tomato_healthy"
+    disease_name = '_'.join(predicted_class.split('_')[1:])  # e.g., "healthy" or "Bacterial_spot"
+
+    return {
+        "plant": plant_name,
+        "disease": disease_name if disease_name else "healthy",
+        "prediction": predicted_class,
+        "confidence": confidence
+    }
+
+def is_healthy(prediction):
+    # Class names separate plant and disease with one to three underscores,
+    # so test the class name rather than the parsed disease
+    return prediction.endswith('healthy')
+
 def predict(img):
     """
     Process image and return prediction with treatment info
@@ -137,23 +247,14 @@ def predict(img):
         # Make prediction
         predictions = model.predict(img_array, verbose=0)
         
-        # Get the predicted class and confidence
-        predicted_class = class_names[np.argmax(predictions[0])]
-        confidence = float(100 * np.max(predictions[0]))
-
-        # Extract plant name from prediction
-        plant_name = predicted_class.split('_')[0]  # e.g., "Tomato" from "Tomato_healthy"
-        disease_name = '_'.join(predicted_class.split('_')[1:])  # e.g., "healthy" or "Bacterial_spot"
+        result = describe_prediction(predictions[0])
 
         # Get treatment info
-        treatment_info = analyzer.get_treatment_info(predicted_class)
+        treatment_info = analyzer.get_treatment_info(result["prediction"])
         
         return {
             "success": True,
-            "plant": plant_name,
-            "disease": disease_name if disease_name else "healthy",
-            "prediction": predicted_class,
-            "confidence": confidence,
+            **result,
             "treatment_info": treatment_info
         }
         
@@ -163,14 +264,231 @@ def predict(img):
             "error": str(e)
         }
 
+def predict_regions(img, mode='regions', max_regions=MAX_REGIONS):
+    """
+    Run the model on leaf regions or tiles of a high-resolution image.
+
+    All crops go through the model as a single batch. The image verdict is
+    the most confident diseased region, or the best overall region when no
+    region is confidently diseased. Falls back to tiling when no leaf
+    region is found.
+    """
+    try:
+        if model is None:
+            raise RuntimeError("Model not loaded. Please ensure the model file exists and is valid.")
+
+        width, height = img.size
+        boxes = []
+        if mode == 'regions':
+            boxes = find_leaf_regions(img, max_regions=max_regions)
+        if not boxes:
+            mode = 'tiles'
+            # Never tile finer than the model input, upscaled tiles add nothing
+            tile_size = max(IMG_WIDTH, min(width, height) // TILES_PER_SIDE)
+            boxes = tile_boxes(width, height, tile_size, max_tiles=max_regions)
+
+        batch = crop_batch(img, boxes, (IMG_WIDTH, IMG_HEIGHT))
+        predictions = model.predict(batch, verbose=0)
+
+        regions = []
+        for box, probabilities in zip(boxes, predictions):
+            region = describe_prediction(probabilities)
+            region["box"] = {
+                "left": box[0],
+                "top": box[1],
+                "right": box[2],
+                "bottom": box[3]
+            }
+            regions.append(region)
+
+        diseased = [r for r in regions
+                    if not is_healthy(r["prediction"]) and r["confidence"] >= REGION_MIN_CONFIDENCE]
+        verdict = max(diseased or regions, key=lambda r: r["confidence"])
+
+        return {
+            "success": True,
+            "plant": verdict["plant"],
+            "disease": verdict["disease"],
+            "prediction": verdict["prediction"],
+            "confidence": verdict["confidence"],
+            "treatment_info": analyzer.get_treatment_info(verdict["prediction"]),
+            "mode": mode,
+            "image_size": {"width": width, "height": height},
+            "affected_regions": len(diseased),
+            "regions": regions
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def scan_frames(frames, dedup_threshold=DEFAULT_DEDUP_THRESHOLD):
+    """
+    Deduplicate and batch-predict a stream of frames, yielding one event per frame.
+
+    Frames are resized to the model input as soon as they are kept, so at
+    most one full-resolution frame and one batch of inputs are in memory.
+    """
+    stats = {"frames_seen": 0, "frames_analyzed": 0}
+
+    def counted(frames):
+        for frame in frames:
+            stats["frames_seen"] += 1
+            yield frame
+
+    def model_inputs(kept):
+        for index, timestamp, img, frame_hash in kept:
+            array = np.asarray(img.resize((IMG_WIDTH, IMG_HEIGHT)), dtype=np.float32) / 255.0
+            yield index, timestamp, frame_hash, array
+
+    kept = deduplicate(counted(frames), dedup_threshold)
+    for batch in batched(model_inputs(kept)):
+        predictions = model.predict(np.stack([item[3] for item in batch]), verbose=0)
+        for (index, timestamp, frame_hash, _), probabilities in zip(batch, predictions):
+            stats["frames_analyzed"] += 1
+            yield {
+                "type": "frame",
+                "frame": index,
+                "timestamp": timestamp,
+                "hash": f"{frame_hash:016x}",
+                **describe_prediction(probabilities)
+            }
+
+    yield {
+        "type": "summary",
+        "frames_seen": stats["frames_seen"],
+        "frames_analyzed": stats["frames_analyzed"],
+        "frames_skipped": stats["frames_seen"] - stats["frames_analyzed"]
+    }
+
+def format_event(event, stream_format):
+    if stream_format == 'sse':
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+def estimate_inference_bytes(width, height, crops=1):
+    """
+    Rough peak memory for decoding an image and running crops through the model
+    """
+    decoded = width * height * CHANNELS
+    # RGB conversion and resize buffers roughly double the decoded image;
+    # the float32 batch is copied once more into a tensor
+    batch = crops * IMG_WIDTH * IMG_HEIGHT * CHANNELS * 4
+    return 2 * decoded + 2 * batch
+
+def size_error(subject, width, height, needed):
+    """
+    Why an upload of this size can never be processed, or None
+    """
+    if width * height > MAX_IMAGE_PIXELS:
+        return f"{subject} too large. Maximum is {MAX_IMAGE_PIXELS // 1000000} megapixels"
+    if needed > memory_budget.capacity:
+        return (f"{subject} too large for this server's {memory_budget.capacity // (1024 * 1024)}MB "
+                "inference memory budget")
+    return None
+
+def parse_location(form):
+    """
+    Optional (lat, lon) from form fields; raises ValueError if invalid
+    """
+    lat, lon = form.get('lat'), form.get('lon')
+    if not lat and not lon:
+        return None, None
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Location out of range")
+    return lat, lon
+
+def record_prediction(result, lat, lon):
+    # History is best-effort: a failed write must not fail the prediction
+    try:
+        history.record(result["prediction"], result["confidence"], model_version, lat, lon)
+    except Exception as e:
+        print(f"Error recording prediction history: {str(e)}")
+
+def client_hash(client_id):
+    return hashlib.sha256(CLIENT_HASH_SALT + client_id.encode()).hexdigest()[:16]
+
+def busy_response(error):
+    response = jsonify({
+        "success": False,
+        "error": str(error)
+    })
+    response.status_code = error.status_code
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def allowed_video(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in VIDEO_EXTENSIONS
+
+@app.before_request
+def check_rate_limit():
+    if not RATE_LIMIT_ENABLED or request.method == 'OPTIONS' or request.endpoint is None:
+        return None
+    if request.remote_addr in RATE_LIMIT_EXEMPT:
+        return None
+    result = rate_limiter.check(request.remote_addr or 'unknown', request.endpoint)
+    g.rate_limit = result
+    if not result.allowed:
+        response = jsonify({
+            "success": False,
+            "error": "Rate limit exceeded. Please retry later."
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, int(result.retry_after + 0.999)))
+        return response
+
+@app.before_request
+def check_content_length():
+    # Reject oversized uploads from the header alone, before the body is read
+    limit = UPLOAD_LIMITS.get(request.endpoint)
+    if limit is None:
+        return
+    request.max_content_length = limit
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({
+            "success": False,
+            "error": f"File too large. Maximum size is {limit/(1024*1024)}MB"
+        }), 413
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_entity_too_large(e):
+    return jsonify({
+        "success": False,
+        "error": f"Request too large. Maximum size is {request.max_content_length/(1024*1024)}MB"
+    }), 413
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "memory_budget": memory_budget.stats(),
+        "decode_slots": decode_slots.stats(),
+        "rate_limit": {
+            "enabled": RATE_LIMIT_ENABLED,
+            "backend": RATE_LIMIT_BACKEND,
+            "rate": RATE_LIMIT_RATE,
+            "burst": RATE_LIMIT_BURST,
+            "clients": {
+                client_hash(client_id): usage
+                for client_id, usage in rate_limiter.stats(top=RATE_LIMIT_STATS_TOP_CLIENTS).items()
+            }
+        }
+    })
+
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    rate_limit = g.get('rate_limit')
+    if rate_limit is not None:
+        response.headers['X-RateLimit-Limit'] = str(int(RATE_LIMIT_BURST))
+        response.headers['X-RateLimit-Remaining'] = str(int(rate_limit.remaining))
     return response
 
 @app.route('/api/predict', methods=['POST'])
@@ -197,13 +515,21 @@ def predict_api():
             "success": False,
             "error": "No file selected"
         }), 400
-        
-    # Check file size
-    if request.content_length > MAX_CONTENT_LENGTH:
+
+    mode = request.form.get('mode', 'single')
+    if mode not in PREDICTION_MODES:
         return jsonify({
             "success": False,
-            "error": f"File too large. Maximum size is {MAX_CONTENT_LENGTH/(1024*1024)}MB"
-        }), 413
+            "error": "Invalid mode. Allowed modes are: " + ", ".join(PREDICTION_MODES)
+        }), 400
+
+    try:
+        lat, lon = parse_location(request.form)
+    except (TypeError, ValueError):
+        return jsonify({
+            "success": False,
+            "error": "lat and lon must be given together as valid coordinates"
+        }), 400
     
     if file and allowed_file(file.filename):
         try:
@@ -212,13 +538,35 @@ def predict_api():
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(filepath)
             
-            # Open and process the image
+            # Open the image; only the header is read until it is decoded
             with Image.open(filepath) as img:
-                result = predict(img)
+                width, height = img.size
+                crops = 1 if mode == 'single' else MAX_REGIONS
+                needed = estimate_inference_bytes(width, height, crops)
+                error = size_error('Image', width, height, needed)
+                if error:
+                    os.remove(filepath)
+                    return jsonify({
+                        "success": False,
+                        "error": error
+                    }), 413
+
+                with decode_slots.reserve(), memory_budget.reserve(needed):
+                    if mode == 'single':
+                        result = predict(img)
+                    else:
+                        result = predict_regions(img, mode)
                 
             # Clean up the uploaded file
             os.remove(filepath)
+            if result["success"]:
+                record_prediction(result, lat, lon)
             return jsonify(result)
+
+        except BudgetExceeded as e:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return busy_response(e)
             
         except Exception as e:
             # Clean up file if it exists
@@ -234,6 +582,196 @@ def predict_api():
         "error": "Invalid file type. Allowed types are: " + ", ".join(ALLOWED_EXTENSIONS)
     }), 400
 
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_stream_api():
+    """
+    Scan a video ('video') or an ordered sequence of images ('frames').
+
+    Results are streamed as NDJSON, or as server-sent events with format=sse.
+    """
+    if model is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded. Please check server logs."
+        }), 500
+
+    stream_format = request.form.get('format', 'ndjson')
+    if stream_format not in ('ndjson', 'sse'):
+        return jsonify({
+            "success": False,
+            "error": "Invalid format. Allowed formats are: ndjson, sse"
+        }), 400
+
+    try:
+        sample_fps = float(request.form.get('sample_fps', DEFAULT_SAMPLE_FPS))
+        dedup_threshold = int(request.form.get('dedup_threshold', DEFAULT_DEDUP_THRESHOLD))
+        fps = float(request.form['fps']) if request.form.get('fps') else None
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "sample_fps, fps and dedup_threshold must be numbers"
+        }), 400
+    # float() accepts 'nan' and 'inf', which would only fail once the stream has started
+    if not math.isfinite(sample_fps) or sample_fps <= 0 or (fps is not None and (not math.isfinite(fps) or fps <= 0)):
+        return jsonify({
+            "success": False,
+            "error": "sample_fps and fps must be positive numbers"
+        }), 400
+
+    video = request.files.get('video')
+    files = request.files.getlist('frames')
+    if video is not None:
+        if not VIDEO_DECODING_AVAILABLE:
+            return jsonify({
+                "success": False,
+                "error": "Video scanning is not available on this server. Send 'frames' images instead."
+            }), 501
+        if not allowed_video(video.filename):
+            return jsonify({
+                "success": False,
+                "error": "Invalid video type. Allowed types are: " + ", ".join(sorted(VIDEO_EXTENSIONS))
+            }), 400
+    elif not files:
+        return jsonify({
+            "success": False,
+            "error": "Send a 'video' file or one or more 'frames' images"
+        }), 400
+    elif not all(allowed_file(f.filename) for f in files):
+        return jsonify({
+            "success": False,
+            "error": "Invalid file type. Allowed types are: " + ", ".join(ALLOWED_EXTENSIONS)
+        }), 400
+
+    # Uploads are spooled to disk: request files are closed before the stream is consumed
+    saved_paths = []
+    capture = None
+    reservation = None
+
+    def cleanup():
+        if capture is not None:
+            capture.release()
+        if reservation is not None:
+            reservation.release()
+        for path in saved_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    try:
+        for file in ([video] if video is not None else files):
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], str(uuid.uuid4()) + '_' + secure_filename(file.filename))
+            file.save(filepath)
+            saved_paths.append(filepath)
+    except Exception as e:
+        cleanup()
+        return jsonify({
+            "success": False,
+            "error": f"Error saving upload: {str(e)}"
+        }), 500
+
+    # Frame sizes come from the headers, so nothing is decoded before the checks
+    try:
+        if video is not None:
+            # Open before streaming so an unreadable file is a 400, not a 200 with an error event
+            capture = open_video(saved_paths[0])
+            sizes = [video_size(capture)]
+        else:
+            sizes = []
+            for path in saved_paths:
+                with Image.open(path) as img:
+                    sizes.append(img.size)
+    except (ValueError, OSError):
+        cleanup()
+        return jsonify({
+            "success": False,
+            "error": "Could not read video file" if video is not None else "Could not read image frames"
+        }), 400
+
+    width, height = max(sizes, key=lambda size: size[0] * size[1])
+    # Memory for the largest frame and one batch is held for the lifetime of the stream
+    needed = estimate_inference_bytes(width, height, FRAME_BATCH_SIZE)
+    error = size_error('Frames', width, height, needed)
+    if error:
+        cleanup()
+        return jsonify({
+            "success": False,
+            "error": error
+        }), 413
+    try:
+        reservation = memory_budget.reserve(needed)
+    except BudgetExceeded as e:
+        cleanup()
+        return busy_response(e)
+
+    if video is not None:
+        frames = video_frames(capture, sample_fps, decode_slots.reserve)
+    else:
+        frames = image_frames(saved_paths, fps, sample_fps, decode_slots.reserve)
+
+    def generate():
+        try:
+            for event in scan_frames(frames, dedup_threshold):
+                yield format_event(event, stream_format)
+        except Exception as e:
+            yield format_event({"type": "error", "error": str(e)}, stream_format)
+        finally:
+            cleanup()
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    response = Response(generate(), mimetype=mimetype)
+    # Clean up even if the client disconnects before the stream starts
+    response.call_on_close(cleanup)
+    return response
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    limit = max(1, min(request.args.get('limit', 50, type=int), HISTORY_MAX_LIMIT))
+    return jsonify(history.recent(limit))
+
+@app.route('/api/outbreaks', methods=['GET'])
+def get_outbreaks():
+    """
+    Disease counts per grid region per day, for outbreak heatmaps.
+
+    Query parameters: start and end (YYYY-MM-DD, default the last 30 days),
+    disease, bbox=min_lon,min_lat,max_lon,max_lat, include_healthy and
+    group=day|region.
+    """
+    try:
+        today = datetime.now(timezone.utc).date()
+        end = request.args.get('end') or today.isoformat()
+        start = request.args.get('start') or (today - timedelta(days=OUTBREAK_DEFAULT_DAYS)).isoformat()
+        # Validate the format; rollups are keyed by ISO day strings
+        datetime.strptime(start, '%Y-%m-%d')
+        datetime.strptime(end, '%Y-%m-%d')
+        bbox = request.args.get('bbox')
+        if bbox:
+            bbox = [float(v) for v in bbox.split(',')]
+            if len(bbox) != 4:
+                raise ValueError("bbox needs four values")
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {str(e)}'}), 400
+
+    group = request.args.get('group', 'day')
+    if group not in ('day', 'region'):
+        return jsonify({'error': 'group must be day or region'}), 400
+
+    try:
+        results = history.outbreaks(
+            start, end,
+            disease=request.args.get('disease'),
+            bbox=bbox,
+            include_healthy=request.args.get('include_healthy', 'false').lower() == 'true',
+            by_day=group == 'day'
+        )
+        return jsonify({
+            'start': start,
+            'end': end,
+            'gridDegrees': GRID_DEGREES,
+            'results': results
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/weather', methods=['GET'])
 def get_weather():
     location = request.args.get('location')
@@ -242,7 +780,7 @@ def get_weather():
 
     try:
         # Get coordinates from location name
-        geo_url = f'http://api.openweathermap.org/geo/1.0/direct?q={location}&limit=1&appid={WEATHER_API_KEY}'
+        geo_url = f'{WEATHER_API_BASE_URL}/geo/1.0/direct?q={location}&limit=1&appid={WEATHER_API_KEY}'
         geo_response = requests.get(geo_url)
         geo_data = geo_response.json()
 
@@ -253,7 +791,7 @@ def get_weather():
         lon = geo_data[0]['lon']
 
         # Get weather data
-        weather_url = f'http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={WEATHER_API_KEY}&units=metric'
+        weather_url = f'{WEATHER_API_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={WEATHER_API_KEY}&units=metric'
         weather_response = requests.get(weather_url)
         weather_data = weather_response.json()
 
@@ -0,0 +1,43 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+import os
+import random
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(ROOT, 'Dataset')
+
+
+def sample_dataset_images(count, seed=0):
+    paths = []
+    for class_dir in sorted(os.listdir(DATASET_DIR)):
+        class_path = os.path.join(DATASET_DIR, class_dir)
+        if os.path.isdir(class_path):
+            paths.extend(os.path.join(class_path, f) for f in sorted(os.listdir(class_path)))
+    rng = random.Random(seed)
+    return rng.sample(paths, min(count, len(paths)))
+
+
+def summarize(samples):
+    samples = np.array(samples) * 1000
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95))
+    }
+
+
+def time_call(fn, runs):
+    """
+    Latency summary of runs calls to fn, after one warm-up call
+    """
+    fn()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
@@ -0,0 +1,103 @@
+"""
+Outbreak query benchmark: rollup table vs. scanning raw prediction rows.
+
+Fills a fresh history database with synthetic predictions spread over
+regions and days, then times the /api/outbreaks query against an equivalent
+GROUP BY over the raw predictions table.
+
+    python benchmarks/history_queries.py --records 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from _common import ROOT, DATASET_DIR, time_call
+
+sys.path.insert(0, ROOT)
+
+from prediction_history import PredictionHistory  # noqa: E402
+
+INSERT_BATCH = 10000
+
+
+def synthetic_records(count, days, regions, seed=0):
+    """
+    Farms cluster around region centres in one country-sized box; each region
+    grows one crop and most of its photos are of healthy plants
+    """
+    rng = random.Random(seed)
+    classes = sorted(os.listdir(DATASET_DIR))
+    crops = {}
+    for name in classes:
+        crops.setdefault(name.split('_')[0], []).append(name)
+    end = datetime.now(timezone.utc).timestamp()
+    start = end - days * 86400
+    centres = []
+    for _ in range(regions):
+        crop_classes = crops[rng.choice(sorted(crops))]
+        weights = [6 if 'healthy' in name else 1 for name in crop_classes]
+        centres.append((rng.uniform(8, 35), rng.uniform(68, 97), crop_classes, weights))
+    for _ in range(count):
+        lat, lon, crop_classes, weights = rng.choice(centres)
+        yield (rng.choices(crop_classes, weights)[0], rng.uniform(40, 100), 'bench',
+               lat + rng.gauss(0, 0.01), lon + rng.gauss(0, 0.01), rng.uniform(start, end))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--regions', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = PredictionHistory(os.path.join(tmp, 'history.db'))
+
+        start = time.perf_counter()
+        batch = []
+        for record in synthetic_records(args.records, args.days, args.regions):
+            batch.append(record)
+            if len(batch) == INSERT_BATCH:
+                history.record_many(batch)
+                batch = []
+        if batch:
+            history.record_many(batch)
+        elapsed = time.perf_counter() - start
+        print(f"Inserted {args.records} predictions in {elapsed:.1f}s ({args.records / elapsed:.0f}/s)")
+
+        single_writes = 1000
+        start = time.perf_counter()
+        for _ in range(single_writes):
+            history.record('Tomato_Late_blight', 90.0, 'bench', 20.0, 80.0)
+        mean_ms = (time.perf_counter() - start) * 1000 / single_writes
+        print(f"Single-row record: {mean_ms:.3f} ms mean")
+
+        today = datetime.now(timezone.utc).date()
+        end_day = today.isoformat()
+        start_day = (today - timedelta(days=30)).isoformat()
+        first_day = (today - timedelta(days=args.days)).isoformat()
+        conn = history._connection()
+
+        queries = {
+            'rollup, 30 days by day': lambda: history.outbreaks(start_day, end_day),
+            'rollup, 30 days by region': lambda: history.outbreaks(start_day, end_day, by_day=False),
+            'rollup, 30 days, bbox': lambda: history.outbreaks(start_day, end_day, bbox=(75, 15, 80, 20)),
+            'rollup, all days, 1° bbox': lambda: history.outbreaks(first_day, end_day, bbox=(77, 20, 78, 21)),
+            'raw scan, 30 days by day': lambda: conn.execute('''
+                SELECT day, region, prediction, COUNT(*), AVG(confidence) FROM predictions
+                WHERE day BETWEEN ? AND ? AND prediction NOT LIKE '%healthy'
+                GROUP BY day, region, prediction
+            ''', (start_day, end_day)).fetchall()
+        }
+        for name, fn in queries.items():
+            stats = time_call(fn, args.runs)
+            print(f"  {name:<28} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""
+Load test and regression benchmark for the API endpoints.
+
+Drives /api/predict, /api/weather, /api/soil-analysis, /api/crop-rotation,
+/api/posts and /api/chat concurrently, then records throughput, latency
+percentiles and server RSS over time as JSON.
+
+By default app.py is started in a child process, so the server has its own
+interpreter and RSS is sampled from it, with /api/weather pointed at a local
+stub of the weather provider so runs are hermetic:
+
+    python benchmarks/load_test.py run --concurrency 8 --duration 30
+    python benchmarks/load_test.py run --url http://localhost:5000 --pid 1234
+    python benchmarks/load_test.py compare baseline.json candidate.json
+
+All load comes from one address, so a server targeted with --url must not
+rate-limit it: start it with RATE_LIMIT_EXEMPT=<load test address> (or
+RATE_LIMIT_ENABLED=0). Runs that were throttled print a warning. Every
+/api/predict call is recorded in the prediction history, so also point
+HISTORY_DB at a scratch file or the synthetic predictions end up in the
+real history and outbreak rollups.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from _common import ROOT, sample_dataset_images
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Relative share of traffic per endpoint, roughly what the web client sends
+ENDPOINT_WEIGHTS = {
+    'predict': 4,
+    'weather': 2,
+    'soil_analysis': 1,
+    'crop_rotation': 1,
+    'posts_list': 2,
+    'posts_create': 1,
+    'chat': 3
+}
+
+RSS_SAMPLE_INTERVAL = 0.5  # seconds
+# Loading the model can take a while on a cold start
+SERVER_START_TIMEOUT = 120  # seconds
+
+# Serves the app without the debug reloader, which would fork a second process
+SERVE_APP = '''
+import logging, sys
+import app
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+app.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)
+'''
+
+# compare: relative change beyond which a metric counts as a regression
+DEFAULT_TOLERANCE = 0.10
+# compare: endpoints with fewer samples than this are too noisy to judge
+MIN_COMPARE_SAMPLES = 30
+
+
+class WeatherStubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the OpenWeatherMap geocoding and weather APIs
+    """
+
+    def do_GET(self):
+        if self.path.startswith('/geo/1.0/direct'):
+            body = [{'name': 'Stubville', 'lat': 28.6, 'lon': 77.2}]
+        elif self.path.startswith('/data/2.5/weather'):
+            body = {
+                'main': {'temp': 26.5, 'humidity': 84},
+                'rain': {'1h': 0.4},
+                'weather': [{'description': 'light rain'}]
+            }
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_weather_stub():
+    return start_in_thread(ThreadingHTTPServer(('127.0.0.1', 0), WeatherStubHandler))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app_server(weather_base_url, history_db):
+    """
+    Start app.py in a child process on a free port and wait until it answers
+    """
+    port = free_port()
+    env = dict(os.environ, WEATHER_API_BASE_URL=weather_base_url,
+               # All load comes from one address, which the per-client limiter would throttle
+               RATE_LIMIT_ENABLED='0',
+               # Keep synthetic predictions out of the real history
+               HISTORY_DB=history_db)
+    process = subprocess.Popen([sys.executable, '-c', SERVE_APP, str(port)], cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'App server exited with status {process.returncode}')
+        try:
+            requests.get(f'{base_url}/api/metrics', timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f'App server did not start within {SERVER_START_TIMEOUT}s')
+
+
+def load_images(count, seed=0):
+    """
+    Read sampled dataset images into memory so disk reads don't skew timings
+    """
+    images = []
+    for path in sample_dataset_images(count, seed):
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def make_request(session, base_url, endpoint, images, rng):
+    if endpoint == 'predict':
+        name, data = rng.choice(images)
+        return session.post(f'{base_url}/api/predict', files={'file': (name, data, 'image/jpeg')})
+    if endpoint == 'weather':
+        return session.get(f'{base_url}/api/weather', params={'location': 'Stubville'})
+    if endpoint == 'soil_analysis':
+        return session.post(f'{base_url}/api/soil-analysis', json={
+            'ph': round(rng.uniform(4.0, 8.0), 1),
+            'moisture': rng.randint(10, 95)
+        })
+    if endpoint == 'crop_rotation':
+        return session.post(f'{base_url}/api/crop-rotation', json={
+            'currentCrop': rng.choice(['tomato', 'potato']),
+            'soilPH': round(rng.uniform(5.0, 7.0), 1),
+            'soilMoisture': rng.randint(40, 90),
+            'weather': {'diseaseRisk': rng.choice(['low', 'medium', 'high'])}
+        })
+    if endpoint == 'posts_list':
+        return session.get(f'{base_url}/api/posts')
+    if endpoint == 'posts_create':
+        return session.post(f'{base_url}/api/posts', json={
+            'title': 'Yellow spots on tomato leaves',
+            'content': 'Noticed yellow spots after the rain, any advice?',
+            'tags': ['tomato', 'disease']
+        })
+    if endpoint == 'chat':
+        return session.post(f'{base_url}/api/chat', json={
+            'message': rng.choice(['What disease is this?', 'Hello', 'Symptoms of blight?'])
+        })
+    raise ValueError(f'Unknown endpoint: {endpoint}')
+
+
+def worker(base_url, endpoints, images, deadline, seed):
+    """
+    Issue weighted random requests until the deadline, recording latencies
+    """
+    rng = random.Random(seed)
+    names = list(endpoints)
+    weights = [endpoints[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    throttled = 0
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = make_request(session, base_url, endpoint, images, rng)
+                ok = response.status_code < 400
+                throttled += response.status_code == 429
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            samples[endpoint].append(elapsed)
+            if not ok:
+                errors[endpoint] += 1
+    return samples, errors, throttled
+
+
+def read_rss(pid):
+    """
+    Resident set size of a process in bytes, or None if unavailable
+    """
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def sample_rss(pid, stop, start_time, out):
+    while not stop.is_set():
+        rss = read_rss(pid)
+        if rss is not None:
+            out.append([round(time.perf_counter() - start_time, 3), rss])
+        stop.wait(RSS_SAMPLE_INTERVAL)
+
+
+def summarize(samples, errors, duration):
+    latencies = np.array(samples) * 1000 if samples else np.zeros(1)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': len(samples) / duration,
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99))
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    endpoints = {name: weight for name, weight in ENDPOINT_WEIGHTS.items()
+                 if not args.endpoints or name in args.endpoints}
+    images = load_images(args.images, args.seed)
+
+    stub = process = scratch = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        pid = args.pid
+    else:
+        stub = start_weather_stub()
+        scratch = tempfile.TemporaryDirectory()
+        process, base_url = start_app_server(f'http://127.0.0.1:{stub.server_port}',
+                                             os.path.join(scratch.name, 'history.db'))
+        pid = process.pid
+
+    # Warm up caches, connection pools and the model
+    with requests.Session() as session:
+        rng = random.Random(args.seed)
+        for name in endpoints:
+            make_request(session, base_url, name, images, rng)
+
+    rss = []
+    stop = threading.Event()
+    start_time = time.perf_counter()
+    sampler = None
+    if pid:
+        sampler = threading.Thread(target=sample_rss, args=(pid, stop, start_time, rss), daemon=True)
+        sampler.start()
+
+    deadline = start_time + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(worker, base_url, endpoints, images, deadline, args.seed + i + 1)
+                   for i in range(args.concurrency)]
+        results = [future.result() for future in futures]
+    duration = time.perf_counter() - start_time
+
+    stop.set()
+    if sampler:
+        sampler.join()
+    if process:
+        process.terminate()
+        process.wait()
+    if stub:
+        stub.shutdown()
+    if scratch:
+        scratch.cleanup()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'target': args.url or 'child process',
+            'concurrency': args.concurrency,
+            'requested_duration_s': args.duration,
+            'duration_s': duration
+        },
+        'endpoints': {},
+        'total': {},
+        'rss': rss
+    }
+    for name in endpoints:
+        samples = [s for worker_samples, _, _ in results for s in worker_samples[name]]
+        errors = sum(worker_errors[name] for _, worker_errors, _ in results)
+        report['endpoints'][name] = summarize(samples, errors, duration)
+    all_samples = [s for worker_samples, _, _ in results for samples in worker_samples.values() for s in samples]
+    all_errors = sum(sum(worker_errors.values()) for _, worker_errors, _ in results)
+    report['total'] = summarize(all_samples, all_errors, duration)
+    report['total']['rate_limited'] = sum(throttled for _, _, throttled in results)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    if report['total']['rate_limited']:
+        print(f"WARNING: {report['total']['rate_limited']} requests were rate limited (HTTP 429); "
+              "start the server with RATE_LIMIT_EXEMPT or RATE_LIMIT_ENABLED=0")
+    print(f'Results saved to {output}')
+
+
+def print_report(report):
+    print(f"{'endpoint':<15}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report['endpoints'].items():
+        print(f"{name:<15}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>9.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    stats = report['total']
+    print(f"{'total':<15}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>9.1f}"
+          f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    if report['rss']:
+        peak = max(rss for _, rss in report['rss'])
+        print(f"peak RSS {peak / (1024 * 1024):.1f} MB over {len(report['rss'])} samples")
+
+
+def compare(args):
+    """
+    Flag latency, throughput, error and memory regressions between two runs
+    """
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    # posts_create grows the server's post list, so posts_list latency depends on run length and load
+    for key in ('concurrency', 'requested_duration_s'):
+        if baseline['meta'].get(key) != candidate['meta'].get(key):
+            print(f"Runs are not comparable: {key} differs "
+                  f"({baseline['meta'].get(key)} vs {candidate['meta'].get(key)})")
+            return 2
+
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        new = candidate['endpoints'].get(name)
+        if new is None or min(base['requests'], new['requests']) < MIN_COMPARE_SAMPLES:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base[metric] > 0 and (new[metric] - base[metric]) / base[metric] > args.tolerance:
+                regressions.append(f'{name} {metric}: {base[metric]:.1f} -> {new[metric]:.1f}')
+        base_error_rate = base['errors'] / max(base['requests'], 1)
+        new_error_rate = new['errors'] / max(new['requests'], 1)
+        if new_error_rate > base_error_rate:
+            regressions.append(f'{name} error rate: {base_error_rate:.1%} -> {new_error_rate:.1%}')
+
+    # The endpoint mix is random, so throughput is only judged in aggregate
+    base_rps = baseline['total']['throughput_rps']
+    new_rps = candidate['total']['throughput_rps']
+    if base_rps > 0 and (base_rps - new_rps) / base_rps > args.tolerance:
+        regressions.append(f'total throughput_rps: {base_rps:.1f} -> {new_rps:.1f}')
+
+    if baseline['rss'] and candidate['rss']:
+        base_peak = max(rss for _, rss in baseline['rss'])
+        new_peak = max(rss for _, rss in candidate['rss'])
+        if (new_peak - base_peak) / base_peak > args.tolerance:
+            regressions.append(f'peak RSS: {base_peak / 2**20:.1f} MB -> {new_peak / 2**20:.1f} MB')
+
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {args.tolerance:.0%}:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print(f'No regressions beyond {args.tolerance:.0%}')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the load test and save results as JSON')
+    run_parser.add_argument('--url', help='Target a running server instead of starting app.py')
+    run_parser.add_argument('--pid', type=int, help='Server process to sample RSS from when using --url')
+    run_parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    run_parser.add_argument('--duration', type=float, default=30, help='Test duration in seconds')
+    run_parser.add_argument('--images', type=int, default=50, help='Dataset images to sample for /api/predict')
+    run_parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINT_WEIGHTS), help='Only drive these endpoints')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='Results file (default: benchmarks/results/<timestamp>.json)')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                                help='Relative change that counts as a regression (default 0.10)')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
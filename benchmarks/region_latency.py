@@ -0,0 +1,94 @@
+"""
+Latency benchmark: single-resize prediction vs. leaf-region and tiled prediction.
+
+High-resolution field photos are synthesised by pasting leaves from Dataset/
+onto a soil-coloured canvas, unless image paths are given on the command line.
+
+    python benchmarks/region_latency.py --runs 20
+    python benchmarks/region_latency.py photo1.jpg photo2.jpg
+"""
+import argparse
+import random
+import sys
+
+from PIL import Image
+
+from _common import ROOT, sample_dataset_images, time_call
+
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+from leaf_regions import find_leaf_regions, tile_boxes, crop_batch, TILES_PER_SIDE  # noqa: E402
+
+FIELD_PHOTO_SIZE = (4000, 3000)  # ~12 megapixels
+LEAVES_PER_PHOTO = 12
+
+
+def synthetic_field_photo(seed=0):
+    """
+    Paste dataset leaves onto a large canvas to mimic a whole-plant photo
+    """
+    rng = random.Random(seed)
+    width, height = FIELD_PHOTO_SIZE
+    canvas = Image.new('RGB', FIELD_PHOTO_SIZE, (118, 96, 72))
+    cols = 4
+    rows = (LEAVES_PER_PHOTO + cols - 1) // cols
+    cell_w, cell_h = width // cols, height // rows
+    for i, path in enumerate(sample_dataset_images(LEAVES_PER_PHOTO, seed)):
+        side = rng.randint(int(0.6 * min(cell_w, cell_h)), int(0.9 * min(cell_w, cell_h)))
+        with Image.open(path) as leaf:
+            leaf = leaf.convert('RGB').resize((side, side))
+        x = (i % cols) * cell_w + rng.randint(0, cell_w - side)
+        y = (i // cols) * cell_h + rng.randint(0, cell_h - side)
+        canvas.paste(leaf, (x, y))
+    return canvas
+
+
+def run(images, runs):
+    size = (app.IMG_WIDTH, app.IMG_HEIGHT)
+    results = {}
+    for index, img in enumerate(images):
+        width, height = img.size
+        regions = find_leaf_regions(img)
+        tile_size = max(app.IMG_WIDTH, min(width, height) // TILES_PER_SIDE)
+        tiles = tile_boxes(width, height, tile_size)
+        row = {
+            'size': f'{width}x{height}',
+            'regions': len(regions),
+            'tiles': len(tiles),
+            'preprocess_regions': time_call(lambda: crop_batch(img, find_leaf_regions(img), size), runs),
+            'preprocess_tiles': time_call(lambda: crop_batch(img, tile_boxes(width, height, tile_size), size), runs)
+        }
+        if app.model is not None:
+            row['single'] = time_call(lambda: app.predict(img), runs)
+            row['regions_end_to_end'] = time_call(lambda: app.predict_regions(img, 'regions'), runs)
+            row['tiles_end_to_end'] = time_call(lambda: app.predict_regions(img, 'tiles'), runs)
+        results[index] = row
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='*', help='High-resolution photos to benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Timed runs per measurement')
+    parser.add_argument('--photos', type=int, default=3, help='Synthetic photos when no images are given')
+    args = parser.parse_args()
+
+    if args.images:
+        images = [Image.open(path).convert('RGB') for path in args.images]
+    else:
+        images = [synthetic_field_photo(seed) for seed in range(args.photos)]
+
+    if app.model is None:
+        print('Model not loaded: reporting preprocessing latency only')
+
+    for index, row in run(images, args.runs).items():
+        print(f"image {index}: {row['size']}, {row['regions']} leaf regions, {row['tiles']} tiles")
+        for name, stats in row.items():
+            if isinstance(stats, dict):
+                print(f"  {name:<22} mean {stats['mean_ms']:8.1f} ms  "
+                      f"p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+from contextlib import nullcontext
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:  # video decoding is optional, image sequences work without it
+    cv2 = None
+
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+VIDEO_DECODING_AVAILABLE = cv2 is not None
+
+# Frames analysed per second of footage
+DEFAULT_SAMPLE_FPS = 2.0
+# Frames whose perceptual hash differs by at most this many bits are duplicates
+DEFAULT_DEDUP_THRESHOLD = 6
+# Frames sent to the model per batch
+FRAME_BATCH_SIZE = 16
+
+HASH_SIZE = 8
+
+
+def difference_hash(img):
+    """
+    64-bit difference hash of an image, robust to small shifts and noise
+    """
+    small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def open_video(path):
+    """
+    Open a video for decoding, failing early if OpenCV is missing or the
+    file cannot be read
+    """
+    if cv2 is None:
+        raise RuntimeError("Video decoding requires opencv-python (pip install opencv-python-headless)")
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        capture.release()
+        raise ValueError("Could not open video file")
+    return capture
+
+
+def video_size(capture):
+    return int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+
+def video_frames(capture, sample_fps=DEFAULT_SAMPLE_FPS, decode_slot=nullcontext):
+    """
+    Yield (index, timestamp, image) for frames sampled from an opened video.
+
+    Only one decoded frame is held at a time, so memory does not grow with
+    the length of the video. Each decode runs inside decode_slot(). The
+    capture is released when the generator ends.
+    """
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        step = max(1, int(round(fps / sample_fps))) if fps > 0 else 1
+        index = 0
+        while capture.grab():
+            if index % step == 0:
+                with decode_slot():
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        break
+                    img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                timestamp = index / fps if fps > 0 else None
+                yield index, timestamp, img
+            index += 1
+    finally:
+        capture.release()
+
+
+def image_frames(paths, fps=None, sample_fps=DEFAULT_SAMPLE_FPS, decode_slot=nullcontext):
+    """
+    Yield (index, timestamp, image) for an ordered sequence of image paths.
+
+    When the capture rate fps is known, frames are sampled down to
+    sample_fps and timestamps are derived from the frame index. Each decode
+    runs inside decode_slot().
+    """
+    step = max(1, int(round(fps / sample_fps))) if fps else 1
+    for index, path in enumerate(paths):
+        if index % step:
+            continue
+        with decode_slot(), Image.open(path) as img:
+            img = img.convert('RGB')
+        yield index, (index / fps if fps else None), img
+
+
+def deduplicate(frames, threshold=DEFAULT_DEDUP_THRESHOLD):
+    """
+    Drop frames that are near-duplicates of the last kept frame.
+
+    Yields (index, timestamp, image, frame_hash) for the kept frames.
+    """
+    last_hash = None
+    for index, timestamp, img in frames:
+        frame_hash = difference_hash(img)
+        if last_hash is not None and hamming_distance(frame_hash, last_hash) <= threshold:
+            continue
+        last_hash = frame_hash
+        yield index, timestamp, img, frame_hash
+
+
+def batched(items, size=FRAME_BATCH_SIZE):
+    """
+    Group an iterable into lists of at most size items
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,174 @@
+import numpy as np
+from PIL import Image
+
+# Segmentation runs on a downscaled copy, the CNN sees full-resolution crops
+SEGMENT_MAX_SIDE = 256
+# The thumbnail is split into a coarse grid; leaf regions are groups of green cells
+GRID_CELLS = 16
+# Excess-green index (2G - R - B) above which a pixel counts as leaf tissue
+EXG_THRESHOLD = 20
+# Fraction of leaf pixels needed for a grid cell to count as leaf
+CELL_LEAF_FRACTION = 0.25
+# Regions smaller than this fraction of the image are ignored
+MIN_REGION_FRACTION = 0.01
+# Padding added around each region, as a fraction of its size
+REGION_PADDING = 0.1
+# Hard upper bound on the number of crops sent to the model per image
+MAX_REGIONS = 16
+
+# Tiling configuration: default tile is a third of the short side
+TILES_PER_SIDE = 3
+TILE_OVERLAP = 0.2
+
+
+def _to_rgb(img):
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def _segmentation_thumbnail(img):
+    """
+    Return a small RGB copy of the image for segmentation
+    """
+    thumb = _to_rgb(img).copy()
+    thumb.thumbnail((SEGMENT_MAX_SIDE, SEGMENT_MAX_SIDE))
+    return thumb
+
+
+def leaf_mask(rgb):
+    """
+    Boolean mask of leaf pixels using the excess-green index
+    """
+    rgb = rgb.astype(np.int16)
+    exg = 2 * rgb[..., 1] - rgb[..., 0] - rgb[..., 2]
+    return exg > EXG_THRESHOLD
+
+
+def _grid_components(cells):
+    """
+    Label 4-connected components of a small boolean grid
+    """
+    rows, cols = cells.shape
+    seen = np.zeros_like(cells, dtype=bool)
+    components = []
+    for r in range(rows):
+        for c in range(cols):
+            if not cells[r, c] or seen[r, c]:
+                continue
+            stack = [(r, c)]
+            seen[r, c] = True
+            members = []
+            while stack:
+                y, x = stack.pop()
+                members.append((y, x))
+                for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                    if 0 <= ny < rows and 0 <= nx < cols and cells[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        stack.append((ny, nx))
+            components.append(members)
+    return components
+
+
+def _square_box(left, top, right, bottom, width, height):
+    """
+    Grow a box to a square (the CNN input is square) and clip it to the image
+    """
+    side = int(round(min(max(right - left, bottom - top), width, height)))
+    cx = (left + right) / 2
+    cy = (top + bottom) / 2
+    left = int(round(min(max(cx - side / 2, 0), width - side)))
+    top = int(round(min(max(cy - side / 2, 0), height - side)))
+    return (left, top, left + side, top + side)
+
+
+def find_leaf_regions(img, max_regions=MAX_REGIONS):
+    """
+    Find leaf regions in an image using green-channel segmentation.
+
+    Returns a list of (left, top, right, bottom) boxes in original image
+    coordinates, largest region first, at most max_regions long.
+    """
+    width, height = img.size
+    thumb = _segmentation_thumbnail(img)
+    mask = leaf_mask(np.asarray(thumb))
+    thumb_h, thumb_w = mask.shape
+
+    # Fraction of leaf pixels per grid cell
+    row_edges = np.linspace(0, thumb_h, GRID_CELLS + 1).astype(int)
+    col_edges = np.linspace(0, thumb_w, GRID_CELLS + 1).astype(int)
+    cells = np.zeros((GRID_CELLS, GRID_CELLS), dtype=bool)
+    for r in range(GRID_CELLS):
+        for c in range(GRID_CELLS):
+            cell = mask[row_edges[r]:row_edges[r + 1], col_edges[c]:col_edges[c + 1]]
+            cells[r, c] = cell.size > 0 and cell.mean() >= CELL_LEAF_FRACTION
+
+    scale_x = width / thumb_w
+    scale_y = height / thumb_h
+    min_area = MIN_REGION_FRACTION * width * height
+
+    regions = []
+    for members in _grid_components(cells):
+        rs = [m[0] for m in members]
+        cs = [m[1] for m in members]
+        left = col_edges[min(cs)] * scale_x
+        right = col_edges[max(cs) + 1] * scale_x
+        top = row_edges[min(rs)] * scale_y
+        bottom = row_edges[max(rs) + 1] * scale_y
+        area = (right - left) * (bottom - top)
+        if area < min_area:
+            continue
+        pad_x = (right - left) * REGION_PADDING
+        pad_y = (bottom - top) * REGION_PADDING
+        box = _square_box(left - pad_x, top - pad_y, right + pad_x, bottom + pad_y, width, height)
+        regions.append((area, box))
+
+    regions.sort(key=lambda r: r[0], reverse=True)
+    return [box for _, box in regions[:max_regions]]
+
+
+def tile_boxes(width, height, tile_size=None, overlap=TILE_OVERLAP, max_tiles=MAX_REGIONS):
+    """
+    Square tiles covering the image with the given overlap.
+
+    If more than max_tiles tiles would be needed, the tile size is grown
+    until the grid fits within the budget. Once tiles span the short side
+    (very elongated images), the positions along the long axis are spread
+    evenly so both ends of the image are still analysed.
+    """
+    if tile_size is None:
+        tile_size = min(width, height) // TILES_PER_SIDE
+    tile_size = max(1, min(tile_size, width, height))
+    while True:
+        stride = max(1, int(tile_size * (1 - overlap)))
+        xs = list(range(0, max(width - tile_size, 0) + 1, stride))
+        ys = list(range(0, max(height - tile_size, 0) + 1, stride))
+        # Make sure the right and bottom edges are covered
+        if xs[-1] + tile_size < width:
+            xs.append(width - tile_size)
+        if ys[-1] + tile_size < height:
+            ys.append(height - tile_size)
+        if len(xs) * len(ys) <= max_tiles or tile_size >= min(width, height):
+            break
+        tile_size = min(int(tile_size * 1.25) + 1, width, height)
+    if len(xs) * len(ys) > max_tiles:
+        if len(xs) >= len(ys):
+            count = max(1, max_tiles // len(ys))
+            xs = [int(round(x)) for x in np.linspace(0, width - tile_size, count)]
+        else:
+            count = max(1, max_tiles // len(xs))
+            ys = [int(round(y)) for y in np.linspace(0, height - tile_size, count)]
+    return [(x, y, x + tile_size, y + tile_size) for y in ys for x in xs]
+
+
+def crop_batch(img, boxes, size):
+    """
+    Crop the boxes out of the image and stack them into a normalized batch
+    """
+    img = _to_rgb(img)
+    batch = np.empty((len(boxes), size[1], size[0], 3), dtype=np.float32)
+    for i, box in enumerate(boxes):
+        crop = img.resize(size, Image.BILINEAR, box=box)
+        batch[i] = np.asarray(crop, dtype=np.float32)
+    batch /= 255.0
+    return batch
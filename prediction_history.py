@@ -0,0 +1,284 @@
+import math
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timezone
+
+# Locations are bucketed into square grid cells of this many degrees (~11km at 0.1)
+GRID_DEGREES = 0.1
+# Region key for predictions recorded without a location
+UNKNOWN_REGION = ''
+# Stored in PRAGMA user_version; 1 moved rollups to integer grid cells
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    prediction TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    model_version TEXT,
+    lat REAL,
+    lon REAL,
+    region TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts);
+CREATE INDEX IF NOT EXISTS predictions_region_ts ON predictions (region, ts);
+
+CREATE TABLE IF NOT EXISTS outbreak_rollups (
+    day TEXT NOT NULL,
+    region TEXT NOT NULL,
+    disease TEXT NOT NULL,
+    cell_y INTEGER,
+    cell_x INTEGER,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (day, region, disease)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outbreak_rollups_cell ON outbreak_rollups (cell_y, cell_x, day);
+'''
+
+ROLLUP_UPSERT = '''
+INSERT INTO outbreak_rollups (day, region, disease, cell_y, cell_x, count, confidence_sum)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, region, disease) DO UPDATE SET
+    count = count + excluded.count,
+    confidence_sum = confidence_sum + excluded.confidence_sum
+'''
+
+
+def grid_index(degrees):
+    # Round away float error first, or 0.3 / 0.1 = 2.9999999999999996 lands in cell 2
+    return math.floor(round(degrees / GRID_DEGREES, 9))
+
+
+def grid_cell(lat, lon):
+    """
+    Integer (row, column) of the grid cell containing a location, or None
+    """
+    if lat is None or lon is None:
+        return None
+    return grid_index(lat), grid_index(lon)
+
+
+def cell_corner(index):
+    # Degrees of a cell's south or west edge
+    return None if index is None else round(index * GRID_DEGREES, 6)
+
+
+def region_key(cell):
+    return UNKNOWN_REGION if cell is None else f'{cell_corner(cell[0]):.6g},{cell_corner(cell[1]):.6g}'
+
+
+def day_of(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d')
+
+
+def add_to_rollups(rollups, day, region, prediction, cell, confidence):
+    # Pre-aggregate so each rollup row is written once per batch
+    key = (day, region, prediction)
+    total = rollups.get(key)
+    if total is None:
+        rollups[key] = [cell, 1, confidence]
+    else:
+        total[1] += 1
+        total[2] += confidence
+
+
+def rollup_params(rollups):
+    return [
+        (day, region, disease, cell[0] if cell else None, cell[1] if cell else None, count, confidence_sum)
+        for (day, region, disease), (cell, count, confidence_sum) in rollups.items()
+    ]
+
+
+class PredictionHistory:
+    """
+    Append-only prediction log in SQLite with per day/region/disease rollups.
+
+    Every insert updates its rollup row in the same transaction, so outbreak
+    queries read the small rollup table instead of scanning raw predictions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._migrate()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self):
+        """
+        Create the schema, or bring an older database up to SCHEMA_VERSION.
+
+        Rollups are derived data, so an outdated rollup table is dropped and
+        rebuilt from the predictions, whose region keys are recomputed too.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Checked inside the write lock so concurrent workers migrate once
+            if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS outbreak_rollups')
+                for statement in SCHEMA.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                self._rebuild_rollups(conn)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _rebuild_rollups(self, conn):
+        regions = []
+        rollups = {}
+        for row_id, day, prediction, confidence, lat, lon, old_region in conn.execute(
+                'SELECT id, day, prediction, confidence, lat, lon, region FROM predictions'):
+            cell = grid_cell(lat, lon)
+            region = region_key(cell)
+            if region != old_region:
+                regions.append((region, row_id))
+            add_to_rollups(rollups, day, region, prediction, cell, confidence)
+        conn.executemany('UPDATE predictions SET region = ? WHERE id = ?', regions)
+        conn.executemany(ROLLUP_UPSERT, rollup_params(rollups))
+
+    def record(self, prediction, confidence, model_version=None, lat=None, lon=None, ts=None):
+        self.record_many([(prediction, confidence, model_version, lat, lon, ts)])
+
+    def record_many(self, records):
+        """
+        Append (prediction, confidence, model_version, lat, lon, ts) tuples
+        """
+        rows = []
+        rollups = {}
+        now = time.time()
+        for prediction, confidence, model_version, lat, lon, ts in records:
+            ts = now if ts is None else ts
+            day = day_of(ts)
+            cell = grid_cell(lat, lon)
+            region = region_key(cell)
+            rows.append((ts, day, prediction, confidence, model_version, lat, lon, region))
+            add_to_rollups(rollups, day, region, prediction, cell, confidence)
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('''
+                INSERT INTO predictions (ts, day, prediction, confidence, model_version, lat, lon, region)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.executemany(ROLLUP_UPSERT, rollup_params(rollups))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def recent(self, limit=50):
+        """
+        Latest predictions, located only to the south-west corner of their
+        grid cell so the public listing does not reveal exact farm positions
+        """
+        rows = self._connection().execute('''
+            SELECT ts, prediction, confidence, model_version, lat, lon
+            FROM predictions ORDER BY ts DESC LIMIT ?
+        ''', (limit,)).fetchall()
+        results = []
+        for ts, prediction, confidence, model_version, lat, lon in rows:
+            cell = grid_cell(lat, lon)
+            results.append({
+                "timestamp": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+                "prediction": prediction,
+                "confidence": confidence,
+                "model_version": model_version,
+                "lat": cell_corner(cell[0]) if cell else None,
+                "lon": cell_corner(cell[1]) if cell else None
+            })
+        return results
+
+    def outbreaks(self, start_day, end_day, disease=None, bbox=None, include_healthy=False, by_day=True):
+        """
+        Prediction counts per region (and day) per disease from the rollups.
+
+        bbox is (min_lon, min_lat, max_lon, max_lat); when given, predictions
+        without a location are excluded.
+        """
+        conn = self._connection()
+        where = ['day BETWEEN ? AND ?']
+        params = [start_day, end_day]
+        source = 'outbreak_rollups'
+        if disease:
+            where.append('disease = ?')
+            params.append(disease)
+        elif not include_healthy:
+            where.append("disease NOT LIKE '%healthy'")
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            # Every cell that overlaps the box, not just those whose corner is inside it
+            where.append('cell_y BETWEEN ? AND ? AND cell_x BETWEEN ? AND ?')
+            params.extend([grid_index(min_lat), grid_index(max_lat), grid_index(min_lon), grid_index(max_lon)])
+            if self._cell_range_is_narrower(conn, start_day, end_day, grid_index(min_lat), grid_index(max_lat)):
+                source = 'outbreak_rollups INDEXED BY outbreak_rollups_cell'
+
+        if by_day:
+            # Rollup rows are already unique per day, region and disease
+            query = f'''
+                SELECT day, region, cell_y, cell_x, disease, count, confidence_sum
+                FROM {source}
+                WHERE {' AND '.join(where)}
+            '''
+        else:
+            query = f'''
+                SELECT NULL, region, cell_y, cell_x, disease, SUM(count), SUM(confidence_sum)
+                FROM {source}
+                WHERE {' AND '.join(where)}
+                GROUP BY region, disease
+                ORDER BY SUM(count) DESC
+            '''
+        rows = conn.execute(query, params).fetchall()
+
+        results = []
+        for row in rows:
+            day, region, cell_y, cell_x, disease_name, count, confidence_sum = row
+            entry = {
+                "region": region or None,
+                "lat": cell_corner(cell_y),
+                "lon": cell_corner(cell_x),
+                "disease": disease_name,
+                "count": count,
+                "avg_confidence": confidence_sum / count
+            }
+            if by_day:
+                entry["day"] = day
+            results.append(entry)
+        return results
+
+    def _cell_range_is_narrower(self, conn, start_day, end_day, min_row, max_row):
+        """
+        Whether a bbox's grid rows select fewer rollups than its day range.
+
+        SQLite keeps no statistics for range selectivity, so it always scans
+        by day. Each range is compared to its column's full extent instead,
+        assuming rollups are spread evenly; both extents are index lookups.
+        """
+        first_day, last_day, low_row, high_row = conn.execute('''
+            SELECT (SELECT MIN(day) FROM outbreak_rollups), (SELECT MAX(day) FROM outbreak_rollups),
+                   (SELECT MIN(cell_y) FROM outbreak_rollups), (SELECT MAX(cell_y) FROM outbreak_rollups)
+        ''').fetchone()
+        if first_day is None or low_row is None:
+            return False
+
+        def days(start, end):
+            return (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+
+        day_fraction = days(max(start_day, first_day), min(end_day, last_day)) / days(first_day, last_day)
+        row_fraction = (min(max_row, high_row) - max(min_row, low_row) + 1) / (high_row - low_row + 1)
+        return row_fraction < day_fraction
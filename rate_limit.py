@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+# Memory store: buckets are spread over independently locked shards
+DEFAULT_SHARDS = 16
+# Buckets idle for this many full refills are dropped (memory: when a shard grows large)
+IDLE_REFILLS_BEFORE_EVICTION = 2
+MAX_CLIENTS_PER_SHARD = 4096
+# SQLite store: seconds between sweeps that delete idle buckets
+PRUNE_INTERVAL = 60
+
+
+class RateLimitResult:
+    def __init__(self, allowed, remaining, retry_after):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _usage(allowed, denied, cost, last_seen):
+    return {
+        "allowed": allowed,
+        "denied": denied,
+        "cost": cost,
+        "last_seen": last_seen
+    }
+
+
+class MemoryBucketStore:
+    """
+    In-process token buckets, sharded by client so requests from different
+    clients rarely contend on the same lock
+    """
+
+    def __init__(self, shards=DEFAULT_SHARDS):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def _shard(self, client_id):
+        return self._shards[zlib.crc32(client_id.encode()) % len(self._shards)]
+
+    def consume(self, client_id, cost, rate, burst):
+        now = time.time()
+        buckets, lock = self._shard(client_id)
+        with lock:
+            bucket = buckets.get(client_id)
+            if bucket is None:
+                if len(buckets) >= MAX_CLIENTS_PER_SHARD:
+                    self._evict_idle(buckets, now, rate, burst)
+                # [tokens, updated, allowed, denied, cost]
+                bucket = buckets[client_id] = [burst, now, 0, 0, 0]
+            tokens = _refill(bucket[0], bucket[1], now, rate, burst)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                bucket[2] += 1
+                bucket[4] += cost
+                return RateLimitResult(True, bucket[0], 0)
+            bucket[0] = tokens
+            bucket[3] += 1
+            return RateLimitResult(False, tokens, (cost - tokens) / rate)
+
+    def _evict_idle(self, buckets, now, rate, burst):
+        idle_after = IDLE_REFILLS_BEFORE_EVICTION * burst / rate
+        for client_id in [c for c, b in buckets.items() if now - b[1] > idle_after]:
+            del buckets[client_id]
+
+    def stats(self, top=None):
+        clients = []
+        for buckets, lock in self._shards:
+            with lock:
+                clients.extend((client_id, list(bucket)) for client_id, bucket in buckets.items())
+        clients.sort(key=lambda item: item[1][4], reverse=True)
+        if top is not None:
+            clients = clients[:top]
+        return {client_id: _usage(bucket[2], bucket[3], bucket[4], bucket[1]) for client_id, bucket in clients}
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file, shared by all worker processes on a host
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    client_id TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    allowed INTEGER NOT NULL DEFAULT 0,
+                    denied INTEGER NOT NULL DEFAULT 0,
+                    cost REAL NOT NULL DEFAULT 0
+                )
+            ''')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, client_id, cost, rate, burst):
+        now = time.time()
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM rate_limit_buckets WHERE client_id = ?', (client_id,)
+            ).fetchone()
+            tokens = burst if row is None else _refill(row[0], row[1], now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('''
+                INSERT INTO rate_limit_buckets (client_id, tokens, updated, allowed, denied, cost)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(client_id) DO UPDATE SET
+                    tokens = excluded.tokens,
+                    updated = excluded.updated,
+                    allowed = allowed + excluded.allowed,
+                    denied = denied + excluded.denied,
+                    cost = cost + excluded.cost
+            ''', (client_id, tokens, now, int(allowed), int(not allowed), cost if allowed else 0))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if now >= self._next_prune:
+            self._next_prune = now + PRUNE_INTERVAL
+            self._prune(conn, now, rate, burst)
+        if allowed:
+            return RateLimitResult(True, tokens, 0)
+        return RateLimitResult(False, tokens, (cost - tokens) / rate)
+
+    def _prune(self, conn, now, rate, burst):
+        # An idle bucket has refilled to burst, so dropping it does not change any limit
+        idle_after = IDLE_REFILLS_BEFORE_EVICTION * burst / rate
+        conn.execute('DELETE FROM rate_limit_buckets WHERE updated < ?', (now - idle_after,))
+
+    def stats(self, top=None):
+        rows = self._connection().execute('''
+            SELECT client_id, allowed, denied, cost, updated FROM rate_limit_buckets
+            ORDER BY cost DESC LIMIT ?
+        ''', (-1 if top is None else top,)).fetchall()
+        return {row[0]: _usage(*row[1:]) for row in rows}
+
+
+class RateLimiter:
+    """
+    Per-client token buckets with a different cost per endpoint.
+
+    Each client refills at `rate` tokens per second up to `burst`; a request
+    to an endpoint costs costs.get(endpoint, default_cost) tokens.
+    """
+
+    def __init__(self, store, rate, burst, costs=None, default_cost=1):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.costs = costs or {}
+        self.default_cost = default_cost
+
+    def cost(self, endpoint):
+        return self.costs.get(endpoint, self.default_cost)
+
+    def check(self, client_id, endpoint):
+        return self.store.consume(client_id, self.cost(endpoint), self.rate, self.burst)
+
+    def stats(self, top=None):
+        """
+        Usage per client, heaviest clients first
+        """
+        return self.store.stats(top)
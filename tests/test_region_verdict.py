@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the test from writing to the real prediction history
+os.environ['HISTORY_DB'] = os.path.join(tempfile.mkdtemp(), 'history.db')
+
+import app  # noqa: E402
+
+
+def one_hot(name):
+    probabilities = np.zeros(len(app.class_names), dtype=np.float32)
+    probabilities[app.class_names.index(name)] = 1.0
+    return probabilities
+
+
+def test_healthy_classes_are_not_diseased():
+    for name in ('Pepper__healthy', 'Potato___healthy', 'Tomato_healthy'):
+        result = app.describe_prediction(one_hot(name))
+        assert app.is_healthy(result["prediction"]), name
+
+
+def test_disease_classes_are_diseased():
+    for name in app.class_names:
+        if 'healthy' not in name:
+            assert not app.is_healthy(app.describe_prediction(one_hot(name))["prediction"]), name